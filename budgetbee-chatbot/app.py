@@ -5,24 +5,40 @@ from __future__ import annotations
 
 import os
 import json
+import threading
 import time
+import asyncio
+import collections
+import heapq
 from datetime import date
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Union
 
+import httpx
 import requests
 import streamlit as st
 from dotenv import load_dotenv, find_dotenv
 from PIL import Image
+import numpy as np
 import pandas as pd
 import altair as alt
 
+from ibm_integration import nlu_analyze_async
+from net import async_transport, pooled_session, post_with_retries
+from semantic_cache import SemanticCache
+
 # ========= ENV LOADING =========
-if os.path.exists("ibmcasing.env"):
-    load_dotenv("ibmcasing.env")
-elif os.path.exists(".env"):
-    load_dotenv(".env")
-else:
-    load_dotenv(find_dotenv())
+@st.cache_resource(show_spinner=False)
+def _load_env() -> None:
+    # Once per process; os.environ keeps the values across reruns
+    if os.path.exists("ibmcasing.env"):
+        load_dotenv("ibmcasing.env")
+    elif os.path.exists(".env"):
+        load_dotenv(".env")
+    else:
+        load_dotenv(find_dotenv())
+
+_load_env()
 
 def _get(key: str, default: str = "") -> str:
     v = os.getenv(key, default)
@@ -47,36 +63,90 @@ SYS_PROMPT = (
     "If you need more details, ask one short follow‑up."
 )
 
-def backend_name() -> str:
-    # Reflects what will be used on the next call
-    if OPENROUTER_API_KEY:
-        return f"OpenRouter · {OPENROUTER_MODEL}"
-    if USE_HF_GRANITE and HF_API_TOKEN and HF_TEXT_MODEL:
-        return f"Hugging Face (IBM Granite) · {HF_TEXT_MODEL}"
-    return "Demo Mode (rule‑based)"
+# Backend used for LLM calls; env values are fixed for the life of the process
+if OPENROUTER_API_KEY:
+    BACKEND_NAME = f"OpenRouter · {OPENROUTER_MODEL}"
+elif USE_HF_GRANITE and HF_API_TOKEN and HF_TEXT_MODEL:
+    BACKEND_NAME = f"Hugging Face (IBM Granite) · {HF_TEXT_MODEL}"
+else:
+    BACKEND_NAME = "Demo Mode (rule‑based)"
 
 # ========= LLM CALLS =========
-def _ask_llm_openrouter(user_q: str) -> str:
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Cap on in-flight OpenRouter requests across all sessions (avoids rate-limit bursts)
+LLM_MAX_CONCURRENCY = 50
+
+@st.cache_resource(show_spinner=False)
+def _http() -> requests.Session:
+    # Shared across reruns so connections to OpenRouter/HF stay warm
+    return pooled_session()
+
+class _LLMRuntime:
+    """Event loop thread that owns the shared OpenRouter client and semaphore.
+    Both bind to the loop they are first used on, and asyncio.run starts a new
+    loop per call, so all OpenRouter coroutines are scheduled on this one."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="llm-loop", daemon=True).start()
+        self.client = httpx.AsyncClient(
+            timeout=60,
+            transport=async_transport(httpx.Limits(max_connections=LLM_MAX_CONCURRENCY)),
+        )
+        self.sem = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+    def run(self, coro):
+        # Blocking call from a script or worker thread (never from this loop)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+@st.cache_resource(show_spinner=False)
+def _llm_runtime() -> _LLMRuntime:
+    return _LLMRuntime()
+
+# A bare question (sent under SYS_PROMPT) or a full chat-messages list
+LLMInput = Union[str, List[Dict[str, str]]]
+
+def _as_messages(user_q: LLMInput) -> List[Dict[str, str]]:
+    if isinstance(user_q, str):
+        return [
+            {"role": "system", "content": SYS_PROMPT},
+            {"role": "user", "content": user_q},
+        ]
+    return user_q
+
+def _as_text(user_q: LLMInput) -> str:
+    # Flatten chat messages for text-only backends (Granite via HF)
+    if isinstance(user_q, str):
+        return user_q
+    labels = {"user": "User: ", "assistant": "Assistant: "}
+    return "\n".join(labels.get(m["role"], "") + m["content"] for m in user_q)
+
+def _openrouter_request(user_q: LLMInput, stream: bool = False) -> tuple[Dict, Dict]:
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://budgetbee.local",
+        "X-Title": "BudgetBee",
+    }
+    data = {
+        "model": OPENROUTER_MODEL,
+        "messages": _as_messages(user_q),
+    }
+    if stream:
+        data["stream"] = True
+    return headers, data
+
+async def _ask_llm_openrouter(user_q: LLMInput, client: httpx.AsyncClient) -> str:
     if not OPENROUTER_API_KEY:
         return "(OpenRouter not configured)"
     try:
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://budgetbee.local",
-            "X-Title": "BudgetBee",
-        }
-        data = {
-            "model": OPENROUTER_MODEL,
-            "messages": [
-                {"role": "system", "content": SYS_PROMPT},
-                {"role": "user", "content": user_q},
-            ],
-        }
-        r = requests.post(url, headers=headers, data=json.dumps(data), timeout=60)
+        headers, data = _openrouter_request(user_q)
+        r = await post_with_retries(client, OPENROUTER_URL, headers=headers, content=json.dumps(data))
         r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"].strip()
+        content = (r.json()["choices"][0]["message"]["content"] or "").strip()
+        if not content:
+            raise ValueError("empty reply")
+        return content
     except Exception as e:
         return f"(AI error via OpenRouter) {e}"
 
@@ -95,56 +165,194 @@ def _ask_llm_granite_hf(user_q: str) -> str:
             "return_full_text": False
         }
     }
-    for attempt in range(2):  # light retry for 429/503
-        try:
-            r = requests.post(url, headers=headers, json=payload, timeout=60)
+    try:
+        # 429/503 are retried with backoff by the pooled session
+        r = _http().post(url, headers=headers, json=payload, timeout=60)
 
-            if r.status_code == 404:
-                return (f"(Granite) HF model not found: '{HF_TEXT_MODEL}'. "
-                        "Set HF_TEXT_MODEL to a valid repo id, e.g. "
-                        "'ibm-granite/granite-3.1-8b-instruct' or 'ibm-granite/granite-3.3-8b-instruct'.")
+        if r.status_code == 404:
+            return (f"(Granite) HF model not found: '{HF_TEXT_MODEL}'. "
+                    "Set HF_TEXT_MODEL to a valid repo id, e.g. "
+                    "'ibm-granite/granite-3.1-8b-instruct' or 'ibm-granite/granite-3.3-8b-instruct'.")
 
-            if r.status_code == 403:
-                return ("(Granite) Access denied. On Hugging Face, open the model page with the SAME account "
-                        "as your token, click 'Agree and access', then retry.")
+        if r.status_code == 403:
+            return ("(Granite) Access denied. On Hugging Face, open the model page with the SAME account "
+                    "as your token, click 'Agree and access', then retry.")
 
-            if r.status_code in (429, 503) and attempt == 0:
-                time.sleep(2.0); continue
+        if r.status_code in (429, 503):
+            return "(Transient error via Hugging Face) Please try again."
 
-            r.raise_for_status()
-            out = r.json()
-            if isinstance(out, list) and out and "generated_text" in out[0]:
-                return out[0]["generated_text"].strip()
-            if isinstance(out, dict) and "generated_text" in out:
-                return out["generated_text"].strip()
-            if isinstance(out, dict) and "choices" in out:
-                return out["choices"][0]["text"].strip()
-            return str(out)
-        except requests.exceptions.HTTPError as e:
-            return f"(AI error via Hugging Face) {e}"
-        except Exception as e:
-            return f"(Network error via Hugging Face) {e}"
-    return "(Transient error via Hugging Face) Please try again."
-
-def ask_llm(user_q: str) -> str:
+        r.raise_for_status()
+        out = r.json()
+        if isinstance(out, list) and out and "generated_text" in out[0]:
+            return out[0]["generated_text"].strip()
+        if isinstance(out, dict) and "generated_text" in out:
+            return out["generated_text"].strip()
+        if isinstance(out, dict) and "choices" in out:
+            return out["choices"][0]["text"].strip()
+        return str(out)
+    except requests.exceptions.HTTPError as e:
+        return f"(AI error via Hugging Face) {e}"
+    except Exception as e:
+        return f"(Network error via Hugging Face) {e}"
+
+AI_NOT_CONFIGURED_TIPS = (
+    "AI is not configured (no OpenRouter or Granite). Quick tips:\n"
+    "• Track expenses weekly • Keep 3–6 months emergency fund • Use SIPs for long‑term goals\n"
+    "• Compare old vs new tax regimes annually • Avoid high‑interest debt\n"
+)
+
+async def _ask_llm_openrouter_shared(user_q: LLMInput) -> str:
+    rt = _llm_runtime()
+    async with rt.sem:
+        return await _ask_llm_openrouter(user_q, rt.client)
+
+async def ask_llm_async(user_q: LLMInput) -> str:
+    """Uncached answer; may be awaited from any event loop."""
     # PRIMARY: OpenRouter
     if OPENROUTER_API_KEY:
-        ans = _ask_llm_openrouter(user_q)
+        ans = await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(_ask_llm_openrouter_shared(user_q), _llm_runtime().loop)
+        )
         # If OpenRouter fails hard, try Granite fallback:
         if ans.startswith("(AI error via OpenRouter)") and USE_HF_GRANITE and HF_API_TOKEN and HF_TEXT_MODEL:
-            fallback = _ask_llm_granite_hf(user_q)
+            fallback = await asyncio.to_thread(_ask_llm_granite_hf, _as_text(user_q))
             return f"(OpenRouter error, used Granite fallback)\n\n{fallback}"
         return ans
     # FALLBACK: Granite (if enabled)
     if USE_HF_GRANITE and HF_API_TOKEN and HF_TEXT_MODEL:
-        return _ask_llm_granite_hf(user_q)
+        return await asyncio.to_thread(_ask_llm_granite_hf, _as_text(user_q))
     # FINAL fallback: static tips
-    return (
-        "AI is not configured (no OpenRouter or Granite). Quick tips:\n"
-        "• Track expenses weekly • Keep 3–6 months emergency fund • Use SIPs for long‑term goals\n"
-        "• Compare old vs new tax regimes annually • Avoid high‑interest debt\n"
+    return AI_NOT_CONFIGURED_TIPS
+
+# Replies starting with these are failures/degraded answers and must not be cached
+_LLM_ERROR_PREFIXES = (
+    "(OpenRouter not configured)",
+    "(AI error via OpenRouter)",
+    "(OpenRouter error, used Granite fallback)",
+    "(Granite",
+    "(AI error via Hugging Face)",
+    "(Network error via Hugging Face)",
+    "(Transient error via Hugging Face)",
+)
+LLM_CACHE_TTL = 24 * 3600
+
+class _UncachedAnswer(Exception):
+    """Carries an error reply out of the cached call so Streamlit doesn't store it."""
+
+@st.cache_data(ttl=LLM_CACHE_TTL, show_spinner=False)
+def _ask_llm_cached(model: str, system: str, user_q: LLMInput) -> str:
+    # model/system are part of the cache key only; the call reads the globals.
+    ans = _llm_runtime().run(ask_llm_async(user_q))
+    if ans.startswith(_LLM_ERROR_PREFIXES):
+        raise _UncachedAnswer(ans)
+    return ans
+
+def ask_llm(user_q: LLMInput) -> str:
+    try:
+        return _ask_llm_cached(OPENROUTER_MODEL, SYS_PROMPT, user_q)
+    except _UncachedAnswer as e:
+        return str(e)
+
+async def ask_llm_many(prompts: List[LLMInput]) -> list:
+    """Answers several prompts concurrently; results keep the order of `prompts`
+    and failures come back as exceptions. Each prompt goes through ask_llm's
+    response cache (checked in a worker thread, as st.cache_data is sync); misses
+    share the pooled OpenRouter client under LLM_MAX_CONCURRENCY."""
+    return await asyncio.gather(
+        *(asyncio.to_thread(ask_llm, p) for p in prompts),
+        return_exceptions=True,
     )
 
+def ask_llm_stream(user_q: LLMInput, status: Dict | None = None):
+    """Yields the answer in pieces as OpenRouter streams it (SSE), for st.write_stream.
+    Without OpenRouter, or if the stream fails or ends before any text, yields ask_llm's answer.
+    A failure after text has been yielded is reported in status["error"], never in the text."""
+    if not OPENROUTER_API_KEY:
+        yield ask_llm(user_q)
+        return
+    got_text = False
+    try:
+        headers, data = _openrouter_request(user_q, stream=True)
+        with _http().post(OPENROUTER_URL, headers=headers, data=json.dumps(data),
+                          stream=True, timeout=60) as r:
+            r.raise_for_status()
+            for raw in r.iter_lines():
+                line = raw.decode("utf-8")
+                # Skip blank separators and ": keep-alive" comment lines
+                if not line.startswith("data:"):
+                    continue
+                chunk = line[len("data:"):].strip()
+                if chunk == "[DONE]":
+                    break
+                event = json.loads(chunk)
+                if "error" in event:
+                    raise RuntimeError(event["error"].get("message", event["error"]))
+                delta = event["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    got_text = True
+                    yield delta
+    except Exception as e:
+        if got_text:
+            if status is not None:
+                status["error"] = f"(AI error via OpenRouter) {e}"
+            return
+    if not got_text:
+        # Failed, or [DONE] with no content: the non-streaming path reports the
+        # error or uses the Granite fallback
+        yield ask_llm(user_q)
+
+# ========= CHAT ANSWER CACHE =========
+# Streamed chat answers bypass _ask_llm_cached, so first-turn answers are kept here:
+# exact question match first, then (optionally) a semantic match.
+CHAT_CACHE_MAX_ENTRIES = 1000
+
+@st.cache_resource(show_spinner=False)
+def _exact_answers() -> collections.OrderedDict:
+    # (model, scope, question) -> (expires_at, answer), oldest first
+    return collections.OrderedDict()
+
+@st.cache_resource(show_spinner=False)
+def _exact_answers_lock() -> threading.Lock:
+    return threading.Lock()
+
+@st.cache_resource(show_spinner=False)
+def _embedder():
+    # Optional: without sentence-transformers only exact matches are reused
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer("all-MiniLM-L6-v2")
+    except Exception:
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _semantic_cache(scope: str) -> SemanticCache | None:
+    model = _embedder()
+    if model is None:
+        return None
+    return SemanticCache(lambda texts: model.encode(texts, normalize_embeddings=True))
+
+def cached_answer(question: str, scope: str) -> str | None:
+    """Earlier answer to `question`, or to a paraphrase of it, within `scope` (e.g. persona)."""
+    hit = _exact_answers().get((OPENROUTER_MODEL, scope, question.strip()))
+    if hit is not None and hit[0] > time.time():
+        return hit[1]
+    cache = _semantic_cache(f"{OPENROUTER_MODEL}|{scope}")
+    return cache.lookup(question) if cache is not None else None
+
+def store_answer(question: str, answer: str, scope: str) -> None:
+    if not answer.strip() or answer.startswith(_LLM_ERROR_PREFIXES):
+        return
+    exact = _exact_answers()
+    key = (OPENROUTER_MODEL, scope, question.strip())
+    with _exact_answers_lock():
+        exact[key] = (time.time() + LLM_CACHE_TTL, answer)
+        exact.move_to_end(key)
+        while len(exact) > CHAT_CACHE_MAX_ENTRIES:
+            exact.popitem(last=False)
+    cache = _semantic_cache(f"{OPENROUTER_MODEL}|{scope}")
+    if cache is not None:
+        cache.add(question, answer)
+
 # ========= PERSONA CONFIGS =========
 def persona_config(persona: str) -> Dict:
     p = (persona or "Professional").lower()
@@ -192,6 +400,7 @@ def persona_config(persona: str) -> Dict:
         }
 
 # ========= CHAT PROMPTS =========
+@lru_cache(maxsize=4)
 def chat_system_prompt(persona: str) -> str:
     cfg = persona_config(persona)
     if cfg["name"] == "Student":
@@ -206,64 +415,125 @@ def chat_system_prompt(persona: str) -> str:
             " Keep answers safe and general (not legal/tax advice). "
             "When user gives numbers, use them. Prefer 3–5 crisp bullets and a 1‑line Next step.")
 
-def make_chat_prompt(persona: str, history: List[Dict[str, str]]) -> str:
-    sysmsg = chat_system_prompt(persona)
-    turns = history[-8:]
-    dialogue = "\n".join(
-        ("User: " + m["content"]) if m["role"] == "user" else ("Assistant: " + m["content"])
-        for m in turns
-    )
-    return f"""{sysmsg}
-
-Conversation:
-{dialogue}
-
-Guidelines:
+CHAT_GUIDELINES = """Guidelines:
 - If the user greets you, greet back briefly and ask one relevant question about their goal.
 - If the user asks a finance question, answer directly and concisely.
 - Use bullets only when it helps clarity (don't force them).
 - Ask at most one short follow‑up when information is missing.
 - Keep answers within 5–8 short sentences unless the user asks for detail.
 """
+# Token budget for the history sent with each chat turn (oldest turns dropped first)
+CHAT_HISTORY_TOKEN_BUDGET = 3000
+
+@st.cache_resource(show_spinner=False)
+def _token_counter():
+    # Optional: without tiktoken, estimate ~4 characters per token
+    try:
+        import tiktoken
+        enc = tiktoken.encoding_for_model("gpt-4o-mini")
+        return lambda text: len(enc.encode(text))
+    except Exception:
+        return lambda text: len(text) // 4 + 1
+
+def new_chat_window() -> Dict:
+    # Recent turns that fit CHAT_HISTORY_TOKEN_BUDGET, with per-message token counts
+    return {"turns": collections.deque(), "tokens": 0}
+
+def chat_window_append(window: Dict, role: str, content: str) -> None:
+    """Adds one message and drops the oldest past the token budget (always keeps
+    the newest). Only the new message is tokenized, so each turn costs O(delta)."""
+    n = _token_counter()(content)
+    window["turns"].append(({"role": role, "content": content}, n))
+    window["tokens"] += n
+    while len(window["turns"]) > 1 and window["tokens"] > CHAT_HISTORY_TOKEN_BUDGET:
+        _, dropped = window["turns"].popleft()
+        window["tokens"] -= dropped
+
+def make_chat_messages(persona: str, window: Dict) -> List[Dict[str, str]]:
+    """System prompt + the trimmed window, sent as chat messages so providers
+    can reuse the cached prompt prefix. SYS_PROMPT leads the system message, as
+    it did when chat went through ask_llm as a single prompt."""
+    sysmsg = f"{SYS_PROMPT}\n\n{chat_system_prompt(persona)}\n\n{CHAT_GUIDELINES}"
+    return [{"role": "system", "content": sysmsg}] + [m for m, _ in window["turns"]]
 
 # ========= BUDGET LOGIC =========
+# (category, default cap as share of income, persona caps may override, tip)
+_BUDGET_RULES = [
+    ("Rent", 0.30, True, "Rent >{pct}% — consider renegotiating, sharing, or relocating."),
+    ("Transport", 0.15, True, "Transport high — use passes/pooling or WFH where possible."),
+    ("Dining", 0.10, True, "Dining high — set a weekly cap and meal‑prep twice a week."),
+    ("Subscriptions", 0.05, True, "Subscriptions high — cancel duplicates or annualize for discounts."),
+    ("Taxes", 0.15, True, "Taxes high — review regime choice and eligible deductions/exemptions."),
+    ("Shopping", 0.10, False, "Shopping >10% — move impulse buys to a monthly wishlist before purchase."),
+    ("Groceries", 0.15, False, "Groceries >15% — weekly list + bulk staples can cut 5–10%."),
+]
+_RULE_CATS = [r[0] for r in _BUDGET_RULES]
+_RULE_MSGS = [r[3] for r in _BUDGET_RULES]
+
 def budget_rules(income: float, expenses: dict, caps: Dict[str, float]) -> list[str]:
     inc = max(1.0, float(income))
-    g = lambda k: float(expenses.get(k, 0))
-    tips = []
-    if g("Rent") > caps.get("Rent", 0.30) * inc:
-        tips.append(f"Rent >{int(caps.get('Rent',0.30)*100)}% — consider renegotiating, sharing, or relocating.")
-    if g("Transport") > caps.get("Transport", 0.15) * inc:
-        tips.append("Transport high — use passes/pooling or WFH where possible.")
-    if g("Dining") > caps.get("Dining", 0.10) * inc:
-        tips.append("Dining high — set a weekly cap and meal‑prep twice a week.")
-    if g("Subscriptions") > caps.get("Subscriptions", 0.05) * inc:
-        tips.append("Subscriptions high — cancel duplicates or annualize for discounts.")
-    if g("Taxes") > caps.get("Taxes", 0.15) * inc:
-        tips.append("Taxes high — review regime choice and eligible deductions/exemptions.")
-    if g("Shopping") > 0.10 * inc:
-        tips.append("Shopping >10% — move impulse buys to a monthly wishlist before purchase.")
-    if g("Groceries") > 0.15 * inc:
-        tips.append("Groceries >15% — weekly list + bulk staples can cut 5–10%.")
-    return tips
-
-def budget_ai_summarize(income: float, expenses: dict, savings_goal: float, persona: str) -> str:
-    total_exp = sum(expenses.values())
+    n = len(_BUDGET_RULES)
+    thresh = np.fromiter(
+        (caps.get(cat, default) if overridable else default for cat, default, overridable, _ in _BUDGET_RULES),
+        dtype=np.float64, count=n,
+    )
+    amt = np.fromiter((float(expenses.get(c, 0)) for c in _RULE_CATS), dtype=np.float64, count=n)
+    mask = amt > thresh * inc
+    return [_RULE_MSGS[i].format(pct=int(thresh[i] * 100)) for i in np.flatnonzero(mask)]
+
+def _round10(x: float) -> float:
+    # Nearest ₹10, so near-identical budgets share one cached AI answer
+    return float(round(float(x) / 10) * 10)
+
+def top_categories(expenses: dict, n: int = 3) -> List[str]:
+    # Bounded heap, O(N log n); same order as sorted(..., reverse=True)[:n]
+    return heapq.nlargest(n, expenses, key=expenses.__getitem__)
+
+def budget_prompt(income: float, expenses: dict, savings_goal: float, persona: str) -> str:
+    income, savings_goal = _round10(income), _round10(savings_goal)
+    rounded: Dict[str, float] = {}
+    total_exp = 0.0
+    for k, v in expenses.items():
+        rounded[k] = r = _round10(v)
+        total_exp += r
     surplus = round(income - total_exp - savings_goal, 2)
     savings_rate = 0 if income <= 0 else round(100 * savings_goal / income, 1)
-    top = sorted(expenses.items(), key=lambda kv: kv[1], reverse=True)[:3]
-    prompt = f"""{chat_system_prompt(persona)}
+    top = top_categories(rounded)
+    return f"""{chat_system_prompt(persona)}
 
 Monthly snapshot (₹):
 - Income: {income}
 - Total expenses: {total_exp}
 - Planned savings: {savings_goal} ({savings_rate}% of income)
 - Surplus after savings: {surplus}
-- Top categories: {[k for k,_ in top]}
+- Top categories: {top}
+
+Give 5 tailored suggestions to improve savings next month (≤120 words).
+"""
+
+def tax_tips_prompt(income: float, expenses: dict, persona: str) -> str:
+    return f"""{chat_system_prompt(persona)}
 
-Give 5 tailored suggestions to improve savings next month (≤120 words), then 1 line on taxes & investments.
+Monthly snapshot (₹):
+- Income: {_round10(income)}
+- Taxes paid: {_round10(expenses.get("Taxes", 0))}
+- Investments: {_round10(expenses.get("Investments", 0))}
+
+Give 3 short tax & investment ideas for this profile (old vs new regime, 80C/80D, SIPs), ≤60 words.
 """
-    return ask_llm(prompt)
+
+async def _analyze(income: float, expenses: dict, savings_goal: float, persona: str) -> tuple:
+    """Savings suggestions, tax tips and NLU on the top categories, all in flight at once."""
+    (ai, tax), nlu = await asyncio.gather(
+        ask_llm_many([
+            budget_prompt(income, expenses, savings_goal, persona),
+            tax_tips_prompt(income, expenses, persona),
+        ]),
+        nlu_analyze_async("Top spending categories: " + ", ".join(top_categories(expenses))),
+    )
+    # ask_llm_many hands failures back as exceptions; show them like any other AI error
+    ai, tax = (r if isinstance(r, str) else f"(AI error via OpenRouter) {r}" for r in (ai, tax))
+    return ai, nlu, tax
 
 # ========= UI / THEME =========
 st.set_page_config(page_title="BudgetBee — Personal Finance Assistant", page_icon="🐝", layout="wide")
@@ -294,8 +564,14 @@ def card(title: str, html_body: str):
     )
 
 # ========= HEADER =========
+@st.cache_resource(show_spinner=False)
+def _logo() -> Image.Image:
+    img = Image.open("logo.png")
+    img.load()  # decode now so reruns reuse the pixels
+    return img
+
 try:
-    logo = Image.open("logo.png")
+    logo = _logo()
     lcol, tcol = st.columns([1, 6])
     with lcol:
         st.image(logo, width=90)
@@ -315,25 +591,29 @@ CFG = persona_config(persona)
 # Keep chat state + reset on persona change
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
+    st.session_state.chat_window = new_chat_window()
     st.session_state.chat_persona = CFG["name"]
 if st.session_state.chat_persona != CFG["name"]:
     st.session_state.chat_history = []
+    st.session_state.chat_window = new_chat_window()
     st.session_state.chat_persona = CFG["name"]
 
 # ========= PAGES =========
 # ---------- CHAT ----------
-if page == "Chat":
+@st.fragment
+def _chat_page(cfg: Dict):
+    # Fragment: a chat submit reruns only this block, not the whole script
     st.subheader("Chat with BudgetBee")
 
     st.markdown(
         f"<div class='persona-banner'>"
-        f"<div class='persona-badge'>{CFG['emoji']} <b>{CFG['name']} mode</b></div>"
-        f"<div style='opacity:.85'>{CFG['banner']}</div></div>",
+        f"<div class='persona-badge'>{cfg['emoji']} <b>{cfg['name']} mode</b></div>"
+        f"<div style='opacity:.85'>{cfg['banner']}</div></div>",
         unsafe_allow_html=True
     )
 
     with st.expander("Debug"):
-        st.write("Next-call backend preference:", backend_name())
+        st.write("Next-call backend preference:", BACKEND_NAME)
         st.write("OpenRouter key present:", bool(OPENROUTER_API_KEY))
         st.write("OpenRouter model:", OPENROUTER_MODEL)
         st.write("Granite enabled:", USE_HF_GRANITE)
@@ -342,12 +622,15 @@ if page == "Chat":
             st.error(st.session_state["last_error"])
 
     cols = st.columns(4)
-    for i, qp in enumerate(CFG["chat_presets"][:4]):
+    for i, qp in enumerate(cfg["chat_presets"][:4]):
         if cols[i].button(qp, use_container_width=True):
             st.session_state["chat_input_fill"] = qp
 
+    # Inside a fragment the input renders inline, so messages go into a container
+    # created above it; otherwise each new turn would land below the input box.
+    msgs = st.container()
     for m in st.session_state.chat_history:
-        with st.chat_message(m["role"]):
+        with msgs.chat_message(m["role"]):
             st.markdown(m["content"])
 
     user_msg = st.chat_input("Ask about savings, taxes, or investments (₹)…")
@@ -357,43 +640,69 @@ if page == "Chat":
 
     if user_msg:
         st.session_state.chat_history.append({"role": "user", "content": user_msg})
-        with st.chat_message("user"):
+        chat_window_append(st.session_state.chat_window, "user", user_msg)
+        with msgs.chat_message("user"):
             st.markdown(user_msg)
 
-        prompt = make_chat_prompt(CFG["name"], st.session_state.chat_history)
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                answer = ask_llm(prompt)
-            st.markdown(answer)
+        messages = make_chat_messages(cfg["name"], st.session_state.chat_window)
+        # Standalone question: a repeat or paraphrase of an earlier one can reuse its answer
+        first_turn = len(st.session_state.chat_history) == 1
+        with msgs.chat_message("assistant"):
+            answer = cached_answer(user_msg, cfg["name"]) if first_turn else None
+            failed = False
+            if answer is None:
+                status: Dict = {}
+                answer = st.write_stream(ask_llm_stream(messages, status))
+                failed = (bool(status.get("error")) or not answer.strip()
+                          or answer.startswith(_LLM_ERROR_PREFIXES))
+                if status.get("error"):
+                    st.error(f"Answer interrupted: {status['error']}")
+                if first_turn and not failed:
+                    store_answer(user_msg, answer, cfg["name"])
+            else:
+                st.markdown(answer)
 
         st.session_state.chat_history.append({"role": "assistant", "content": answer})
+        # Failed or truncated answers stay on screen but are not sent back to the model
+        if not failed:
+            chat_window_append(st.session_state.chat_window, "assistant", answer)
 
 # ---------- BUDGET ----------
-elif page == "Budget":
+@st.cache_resource(show_spinner=False)
+def _donut_template() -> alt.Chart:
+    # Spec built once; each analysis only swaps in its data (properties() returns a copy)
+    return alt.Chart().encode(
+        theta=alt.Theta("Amount:Q", stack=True),
+        color=alt.Color("Category:N", legend=alt.Legend(title="Categories")),
+        tooltip=["Category:N", "Amount:Q", "Share:Q"]
+    ).mark_arc(outerRadius=120, innerRadius=70)
+
+@st.fragment
+def _budget_page(cfg: Dict):
     st.subheader("Monthly Budget Analyzer")
 
     st.markdown(
         f"<div class='persona-banner'>"
-        f"<div class='persona-badge'>{CFG['emoji']} <b>{CFG['name']} mode</b></div>"
-        f"<div style='opacity:.85'>{CFG['banner']}</div></div>",
+        f"<div class='persona-badge'>{cfg['emoji']} <b>{cfg['name']} mode</b></div>"
+        f"<div style='opacity:.85'>{cfg['banner']}</div></div>",
         unsafe_allow_html=True
     )
 
     col1, col2 = st.columns(2)
     with col1:
-        default_income = 25000.0 if CFG["name"] == "Student" else 60000.0
+        default_income = 25000.0 if cfg["name"] == "Student" else 60000.0
         income = st.number_input("Monthly income (₹)", min_value=0.0, value=default_income, step=1000.0)
-        default_saving = 3000.0 if CFG["name"] == "Student" else 12000.0
+        default_saving = 3000.0 if cfg["name"] == "Student" else 12000.0
         savings_goal = st.number_input("Planned savings this month (₹)", min_value=0.0, value=default_saving, step=1000.0)
     with col2:
         st.markdown("**Expenses by category (₹)**")
-        DEFAULT_CATS = CFG["default_cats"]
-        default_vals = CFG["default_vals"]
+        DEFAULT_CATS = cfg["default_cats"]
+        default_vals = cfg["default_vals"]
         expenses = {}
         for i, cat in enumerate(DEFAULT_CATS):
             expenses[cat] = st.number_input(
                 cat, min_value=0.0, value=float(default_vals[i]),
-                step=500.0, key=f"exp_{CFG['name']}_{cat}"
+                step=500.0, key=f"exp_{cfg['name']}_{cat}"
             )
 
     if st.button("Analyze Budget"):
@@ -417,24 +726,35 @@ elif page == "Budget":
             st.error(f"Not feasible this month: shortfall of ₹{shortfall:.0f}. "
                      f"Reduce expenses, lower savings goal, or increase income.")
 
-        df = pd.DataFrame([{"Category": k, "Amount": round(v, 2)} for k, v in expenses.items() if v > 0])
-        if not df.empty:
-            total_amt = float(df["Amount"].sum())
-            df["Share"] = (df["Amount"] / total_amt * 100).round(2)
-            base = alt.Chart(df).encode(
-                theta=alt.Theta("Amount", stack=True),
-                color=alt.Color("Category", legend=alt.Legend(title="Categories")),
-                tooltip=["Category", "Amount", "Share"]
-            )
-            donut = base.mark_arc(outerRadius=120, innerRadius=70)
+        arr = np.fromiter(expenses.values(), dtype=np.float64, count=len(expenses))
+        mask = arr > 0
+        if mask.any():
+            # Column-wise straight from the arrays, no per-row dicts
+            amts = np.round(arr[mask], 2)
+            df = pd.DataFrame({"Category": np.array(list(expenses), dtype=object)[mask], "Amount": amts})
+            df["Share"] = np.round(amts / amts.sum() * 100, 2)
+            donut = _donut_template().properties(data=df)
             st.altair_chart(donut, use_container_width=True)
 
-        tips = budget_rules(income, expenses, CFG["caps"])
-        pills = "".join([f"<span class='bee-pill'>{c}</span>" for c in sorted(expenses, key=expenses.get, reverse=True)[:3]])
+        tips = budget_rules(income, expenses, cfg["caps"])
+        pills = "".join([f"<span class='bee-pill'>{c}</span>" for c in top_categories(expenses)])
         card("Top spend categories", pills or "–")
-        ai = budget_ai_summarize(income, expenses, savings_goal, CFG["name"])
+        with st.spinner("Analyzing..."):
+            ai, nlu, tax = asyncio.run(_analyze(income, expenses, savings_goal, cfg["name"]))
         card("Recommendations", "<ul style='margin:8px 0;'>" + "".join([f"<li>{t}</li>" for t in tips]) + "</ul>")
         card("AI Suggestions", f"<pre style='white-space:pre-wrap;margin:0;'>{ai}</pre>")
+        # Demo mode / failures give both calls the same static tips or error; show it once
+        if tax != ai and tax != AI_NOT_CONFIGURED_TIPS and not tax.startswith(_LLM_ERROR_PREFIXES):
+            card("Tax & Investments", f"<pre style='white-space:pre-wrap;margin:0;'>{tax}</pre>")
+        keywords = [k.get("text") for k in (nlu or {}).get("keywords", []) if k.get("text")]
+        if keywords:
+            card("Spending themes (Watson NLU)", "".join(f"<span class='bee-pill'>{k}</span>" for k in keywords[:6]))
+
+if page == "Chat":
+    _chat_page(CFG)
+
+elif page == "Budget":
+    _budget_page(CFG)
 
 # ---------- GOALS ----------
 elif page == "Goals":
@@ -483,5 +803,5 @@ It analyzes budgets, goals, and questions related to savings, taxes, and investm
 - **Privacy‑first:** no public sharing of your data; you control keys locally.
 - **Helpful fallback:** if AI keys aren’t set, you still get safe, non‑AI tips.
 """)
-    st.markdown(f"**Current preference:** {backend_name()}")
+    st.markdown(f"**Current preference:** {BACKEND_NAME}")
     st.caption("© BudgetBee — Built with Streamlit • All amounts in ₹")
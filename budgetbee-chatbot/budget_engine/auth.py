@@ -1,41 +1,49 @@
 # budget_engine/auth.py
 from __future__ import annotations
-import os, csv, hashlib, time
+import os, hashlib, hmac, sqlite3, time, uuid
 from dataclasses import dataclass
-from typing import Optional, Dict
+from typing import Optional
 
-# ---- Use absolute path to the project root ----
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-USERS_FILE = os.path.join(BASE_DIR, "assets", "users.csv")
+import streamlit as st
+
+from . import db
 
 # Session store (persistent "remember me")
-SESSIONS_FILE = os.path.join(BASE_DIR, "assets", "sessions.csv")
 SESSION_TTL_SECONDS = 30 * 24 * 3600  # 30 days
+# Expired rows are deleted in bulk once this many have piled up
+SESSION_PURGE_THRESHOLD = 100
+
+# scrypt cost parameters (~16 MB, tens of ms per hash)
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**14, 8, 1
 
 
 @dataclass
 class User:
     name: str
     email: str          # always stored lowercase + trimmed
-    password_hash: str  # SHA256 (demo only)
+    password_hash: str  # scrypt hex; legacy rows without salt are plain SHA256
     persona: str        # "Student" or "Professional"
     created_at: float
+    salt: str = ""      # hex; empty for legacy SHA256 rows
 
 def ensure_user_store() -> None:
-    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-    if not os.path.exists(USERS_FILE):
-        with open(USERS_FILE, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["name", "email", "password_hash", "persona", "created_at"])
-                # sessions.csv
-    if not os.path.exists(SESSIONS_FILE):
-        with open(SESSIONS_FILE, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["token", "email", "expires_at"])
+    db.get_db()
+
+
+def _new_salt() -> str:
+    return os.urandom(16).hex()
 
+def _hash_pw(password: str, salt: str) -> str:
+    if not salt:  # legacy accounts created before salted scrypt
+        return hashlib.sha256(password.encode("utf-8")).hexdigest()
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=bytes.fromhex(salt),
+        n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32,
+    ).hex()
 
-def _hash_pw(password: str) -> str:
-    return hashlib.sha256(password.encode("utf-8")).hexdigest()
+def _auth_memo_check(u: User, password: str) -> str:
+    # Cheap fingerprint of a verified (account, password) pair, kept per Streamlit session
+    return hashlib.sha256(f"{u.email}|{u.salt}|{u.password_hash}|{password}".encode("utf-8")).hexdigest()
 
 def _normalize_email(email: str) -> str:
     return (email or "").strip().lower()
@@ -43,128 +51,89 @@ def _normalize_email(email: str) -> str:
 def _normalize_pw(pw: str) -> str:
     return (pw or "").strip()
 
-def _load_users() -> Dict[str, User]:
-    ensure_user_store()
-    users: Dict[str, User] = {}
-    with open(USERS_FILE, "r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            email_norm = _normalize_email(row["email"])
-            users[email_norm] = User(
-                name=row["name"].strip(),
-                email=email_norm,
-                password_hash=row["password_hash"],
-                persona=(row["persona"] or "").strip() or "Professional",
-                created_at=float(row.get("created_at", time.time())),
-            )
-    return users
-
-def _save_users(users: Dict[str, User]) -> None:
-    with open(USERS_FILE, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["name", "email", "password_hash", "persona", "created_at"])
-        for u in users.values():
-            w.writerow([u.name, u.email, u.password_hash, u.persona, u.created_at])
+_USER_COLUMNS = "name, email, pw_hash, persona, created_at, salt"
+
+def _row_to_user(row: sqlite3.Row) -> User:
+    return User(row["name"], row["email"], row["pw_hash"], row["persona"], row["created_at"], row["salt"])
 
 def email_exists(email: str) -> bool:
-    return _normalize_email(email) in _load_users()
+    return db.query_one("SELECT 1 FROM users WHERE email = ?", (_normalize_email(email),)) is not None
 
 def register_user(name: str, email: str, password: str, persona: str) -> tuple[bool, str]:
-    users = _load_users()
     email_norm = _normalize_email(email)
     pw_norm = _normalize_pw(password)
     if not email_norm:
         return False, "Please enter a valid email."
-    if email_norm in users:
+    if email_exists(email_norm):
         return False, "An account with this email already exists."
     if len(pw_norm) < 6:
         return False, "Password must be at least 6 characters."
 
-    users[email_norm] = User(
-        name=(name or "").strip() or "User",
-        email=email_norm,
-        password_hash=_hash_pw(pw_norm),
-        persona=(persona or "Professional").strip(),
-        created_at=time.time(),
-    )
-    _save_users(users)
+    salt = _new_salt()
+    try:
+        db.execute(
+            f"INSERT INTO users ({_USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+            ((name or "").strip() or "User", email_norm, _hash_pw(pw_norm, salt),
+             (persona or "Professional").strip(), time.time(), salt),
+        )
+    except sqlite3.IntegrityError:  # registered concurrently
+        return False, "An account with this email already exists."
     return True, "Account created successfully."
 
 def authenticate_user(email: str, password: str) -> Optional[User]:
-    users = _load_users()
     email_norm = _normalize_email(email)
     pw_norm = _normalize_pw(password)
-    u = users.get(email_norm)
+    u = get_user(email_norm)
     if not u:
         return None
-    return u if u.password_hash == _hash_pw(pw_norm) else None
+    memo = st.session_state.get("auth_ok")
+    if memo and memo["email"] == email_norm and hmac.compare_digest(memo["check"], _auth_memo_check(u, pw_norm)):
+        return u
+    if not hmac.compare_digest(u.password_hash, _hash_pw(pw_norm, u.salt)):
+        return None
+    if not u.salt:
+        # Upgrade legacy SHA256 rows to salted scrypt on first successful login
+        salt = _new_salt()
+        u = User(u.name, u.email, _hash_pw(pw_norm, salt), u.persona, u.created_at, salt)
+        db.execute("UPDATE users SET pw_hash = ?, salt = ? WHERE email = ?", (u.password_hash, salt, u.email))
+    st.session_state["auth_ok"] = {"email": email_norm, "check": _auth_memo_check(u, pw_norm)}
+    return u
 
 def get_user(email: str) -> Optional[User]:
-    return _load_users().get(_normalize_email(email))
+    row = db.query_one(f"SELECT {_USER_COLUMNS} FROM users WHERE email = ?", (_normalize_email(email),))
+    return _row_to_user(row) if row else None
 
 def update_user_persona(email: str, persona: str) -> None:
-    users = _load_users()
-    key = _normalize_email(email)
-    if key in users:
-        u = users[key]
-        users[key] = User(u.name, u.email, u.password_hash, (persona or u.persona).strip(), u.created_at)
-        _save_users(users)
-import uuid
-
-def _load_sessions() -> Dict[str, dict]:
-    ensure_user_store()
-    out: Dict[str, dict] = {}
+    if (persona or "").strip():
+        db.execute("UPDATE users SET persona = ? WHERE email = ?", (persona.strip(), _normalize_email(email)))
+
+def _purge_expired_sessions() -> None:
+    # Lookups already ignore expired rows; deleting them is only housekeeping
     now = time.time()
-    changed = False
-    if os.path.exists(SESSIONS_FILE):
-        with open(SESSIONS_FILE, "r", encoding="utf-8") as f:
-            r = csv.DictReader(f)
-            for row in r:
-                token = (row.get("token") or "").strip()
-                email = _normalize_email(row.get("email") or "")
-                try:
-                    exp = float(row.get("expires_at", "0"))
-                except:
-                    exp = 0.0
-                if token and email:
-                    if exp > now:
-                        out[token] = {"email": email, "expires_at": exp}
-                    else:
-                        changed = True
-    if changed:
-        _save_sessions(out)
-    return out
-
-def _save_sessions(sessions: Dict[str, dict]) -> None:
-    with open(SESSIONS_FILE, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["token", "email", "expires_at"])
-        for t, s in sessions.items():
-            w.writerow([t, s["email"], s["expires_at"]])
+    expired = db.query_one("SELECT COUNT(*) FROM sessions WHERE expires_at <= ?", (now,))[0]
+    if expired > SESSION_PURGE_THRESHOLD:
+        db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
 
 def create_session(email: str) -> str:
-    sessions = _load_sessions()
+    _purge_expired_sessions()
     token = uuid.uuid4().hex
-    sessions[token] = {
-        "email": _normalize_email(email),
-        "expires_at": time.time() + SESSION_TTL_SECONDS,
-    }
-    _save_sessions(sessions)
+    db.execute(
+        "INSERT INTO sessions (token, email, expires_at) VALUES (?, ?, ?)",
+        (token, _normalize_email(email), time.time() + SESSION_TTL_SECONDS),
+    )
     return token
 
 def user_from_session(token: str) -> Optional[User]:
     if not token:
         return None
-    sessions = _load_sessions()
-    info = sessions.get(token)
-    if not info:
-        return None
-    # If user no longer exists, revoke.
-    u = get_user(info["email"])
-    return u
+    # One primary-key lookup; sessions of deleted users find no row.
+    row = db.query_one(
+        "SELECT u.name, u.email, u.pw_hash, u.persona, u.created_at, u.salt "
+        "FROM sessions s JOIN users u ON u.email = s.email "
+        "WHERE s.token = ? AND s.expires_at > ?",
+        (token, time.time()),
+    )
+    return _row_to_user(row) if row else None
 
 def revoke_session(token: str) -> None:
-    sessions = _load_sessions()
-    if token in sessions:
-        sessions.pop(token)
-        _save_sessions(sessions)
+    db.execute("DELETE FROM sessions WHERE token = ?", (token,))
@@ -0,0 +1,98 @@
+# budget_engine/db.py
+from __future__ import annotations
+import os, csv, sqlite3, threading, time
+from typing import Optional
+
+import streamlit as st
+
+# ---- Use absolute path to the project root ----
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DB_FILE = os.path.join(BASE_DIR, "assets", "budgetbee.db")
+
+# Pre-SQLite stores, imported once into an empty database
+LEGACY_USERS_FILE = os.path.join(BASE_DIR, "assets", "users.csv")
+LEGACY_SESSIONS_FILE = os.path.join(BASE_DIR, "assets", "sessions.csv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email      TEXT PRIMARY KEY,
+    name       TEXT NOT NULL,
+    pw_hash    TEXT NOT NULL,
+    salt       TEXT NOT NULL DEFAULT '',
+    persona    TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    token      TEXT PRIMARY KEY,
+    email      TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at);
+"""
+
+# One connection is shared by all Streamlit sessions; serialize its transactions.
+_lock = threading.RLock()
+
+
+@st.cache_resource(show_spinner=False)
+def get_db() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL appends each write to a log that SQLite compacts at checkpoints.
+    # synchronous=NORMAL applies to the whole connection: every commit (sessions,
+    # registrations, persona updates, password-hash upgrades) skips its fsync.
+    # A crash never corrupts the DB, but a power loss can roll back the last few
+    # commits before the next checkpoint.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with _lock, conn:
+        conn.executescript(SCHEMA)
+        _import_legacy_csv(conn)
+        conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+    return conn
+
+def execute(sql: str, params: tuple = ()) -> int:
+    """Runs one write statement in its own transaction; returns the affected row count."""
+    conn = get_db()
+    with _lock, conn:
+        return conn.execute(sql, params).rowcount
+
+def query_one(sql: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+    conn = get_db()
+    with _lock:
+        return conn.execute(sql, params).fetchone()
+
+def _import_legacy_csv(conn: sqlite3.Connection) -> None:
+    if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        return
+    if os.path.exists(LEGACY_USERS_FILE):
+        with open(LEGACY_USERS_FILE, "r", encoding="utf-8") as f:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (email, name, pw_hash, salt, persona, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        (row["email"] or "").strip().lower(),
+                        (row["name"] or "").strip(),
+                        row["password_hash"],
+                        (row.get("salt") or "").strip(),
+                        (row["persona"] or "").strip() or "Professional",
+                        float(row.get("created_at") or time.time()),
+                    )
+                    for row in csv.DictReader(f) if (row.get("email") or "").strip()
+                ],
+            )
+    if os.path.exists(LEGACY_SESSIONS_FILE):
+        with open(LEGACY_SESSIONS_FILE, "r", encoding="utf-8") as f:
+            rows = []
+            for row in csv.DictReader(f):
+                token = (row.get("token") or "").strip()
+                email = (row.get("email") or "").strip().lower()
+                try:
+                    exp = float(row.get("expires_at", "0"))
+                except ValueError:
+                    exp = 0.0
+                if token and email:
+                    rows.append((token, email, exp))
+            conn.executemany("INSERT OR IGNORE INTO sessions (token, email, expires_at) VALUES (?, ?, ?)", rows)
@@ -1,3 +1,4 @@
+import heapq
 from datetime import date
 from typing import Dict, List, Tuple
 
@@ -11,10 +12,16 @@ def pct(part, whole):
     return 0 if whole == 0 else round(100 * part / whole, 2)
 
 def compute_summary(income: float, expenses: Dict[str, float], savings_goal: float):
-    total_expenses = round(sum(expenses.values()), 2)
+    # One pass for the total and the shares; builtin round() keeps int amounts as ints
+    tot = 0
+    expense_shares = {}
+    for k, v in expenses.items():
+        tot += v
+        expense_shares[k] = {"amount": round(v, 2), "pct": pct(v, income)}
+    total_expenses = round(tot, 2)
     savings_rate = pct(savings_goal, income)
-    expense_shares = {k: {"amount": round(v,2), "pct": pct(v, income)} for k, v in expenses.items()}
-    top = sorted(expenses.items(), key=lambda x: x[1], reverse=True)[:3]
+    # Bounded heap, same order as sorted(..., reverse=True)[:3]
+    top = heapq.nlargest(3, expenses, key=expenses.__getitem__)
     surplus = round(income - total_expenses - savings_goal, 2)
     emergency_months = round((income * 3) / max(1, income - total_expenses), 2) if income > total_expenses else 0
     return {
@@ -23,7 +30,7 @@ def compute_summary(income: float, expenses: Dict[str, float], savings_goal: flo
         "savings_goal": savings_goal,
         "savings_rate": savings_rate,
         "expense_shares": expense_shares,
-        "top_categories": [k for k,_ in top],
+        "top_categories": top,
         "surplus": surplus,
         "surplus_positive": surplus >= 0,
         "emergency_fund_months": emergency_months
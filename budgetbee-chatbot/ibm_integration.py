@@ -1,22 +1,47 @@
-import os, requests
+import asyncio
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+from net import pooled_session
+
+# Keep-alive pool shared by all NLU/watsonx calls
+_SESSION = pooled_session()
+
+@dataclass(frozen=True)
+class _IBMConfig:
+    nlu_key: str
+    nlu_url: str
+    watsonx_key: str
+    watsonx_url: str
+    watsonx_model_id: str
+    watsonx_project_id: str
+
+@lru_cache(maxsize=1)
+def _config() -> _IBMConfig:
+    # Read once, on first use (after the app has loaded .env)
+    return _IBMConfig(
+        nlu_key=os.getenv("NLU_KEY") or "",
+        nlu_url=os.getenv("NLU_URL") or "",
+        watsonx_key=os.getenv("WATSONX_KEY") or "",
+        watsonx_url=os.getenv("WATSONX_URL") or "",
+        watsonx_model_id=os.getenv("WATSONX_MODEL_ID") or "",
+        watsonx_project_id=os.getenv("WATSONX_PROJECT_ID") or "",
+    )
 
 def _have_env():
-    return all([
-        os.getenv("WATSONX_KEY"),
-        os.getenv("WATSONX_URL"),
-        os.getenv("WATSONX_MODEL_ID"),
-        os.getenv("WATSONX_PROJECT_ID")
-    ])
+    c = _config()
+    return all([c.watsonx_key, c.watsonx_url, c.watsonx_model_id, c.watsonx_project_id])
 
 def nlu_analyze(text: str):
     """Optional: IBM Watson NLU sentiment/keywords (silent fail)."""
-    key = os.getenv("NLU_KEY"); url = os.getenv("NLU_URL")
+    key = _config().nlu_key; url = _config().nlu_url
     if not key or not url:
         return None
     try:
         headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
         payload = {"text": text, "features": {"keywords": {}, "sentiment": {}}}
-        r = requests.post(url.rstrip('/') + '/v1/analyze?version=2022-04-07',
+        r = _SESSION.post(url.rstrip('/') + '/v1/analyze?version=2022-04-07',
                           json=payload, headers=headers, timeout=12)
         if r.ok:
             return r.json()
@@ -24,24 +49,29 @@ def nlu_analyze(text: str):
         pass
     return None
 
+async def nlu_analyze_async(text: str):
+    """nlu_analyze on a worker thread, so it can be gathered with other calls."""
+    return await asyncio.to_thread(nlu_analyze, text)
+
 def watsonx_generate(prompt: str):
     """Optional: call watsonx text-generation (silent fail). Returns None on error."""
     if not _have_env():
         return None
+    c = _config()
     try:
         # NOTE: API surface can vary by account/region; keep this minimal and fail-safe.
         headers = {
-            "Authorization": f"Bearer {os.getenv('WATSONX_KEY')}",
+            "Authorization": f"Bearer {c.watsonx_key}",
             "Content-Type": "application/json"
         }
         body = {
-            "model_id": os.getenv("WATSONX_MODEL_ID"),
+            "model_id": c.watsonx_model_id,
             "input": prompt,
             "parameters": {"decoding_method": "greedy", "max_new_tokens": 400},
-            "project_id": os.getenv("WATSONX_PROJECT_ID")
+            "project_id": c.watsonx_project_id
         }
-        url = os.getenv("WATSONX_URL").rstrip('/') + "/ml/v1/text/generation?version=2023-10-31"
-        resp = requests.post(url, json=body, headers=headers, timeout=20)
+        url = c.watsonx_url.rstrip('/') + "/ml/v1/text/generation?version=2023-10-31"
+        resp = _SESSION.post(url, json=body, headers=headers, timeout=20)
         if resp.ok:
             data = resp.json()
             # attempt to pull text field commonly present
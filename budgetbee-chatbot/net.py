@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def pooled_session() -> requests.Session:
+    """Keep-alive session: reuses TCP/TLS connections and retries failed connects,
+    rate limits and transient 5xx with exponential backoff (honours Retry-After)."""
+    retry = Retry(
+        total=RETRY_TOTAL,
+        # Never retry once a request may have reached the server: a timed-out
+        # generation can already be billed, and 3 x 60s reads would stall the UI.
+        read=0,
+        other=0,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "POST"}),  # needed for status retries on POST
+        raise_on_status=False,  # hand the last response back so callers can report it
+    )
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def async_transport(limits: httpx.Limits) -> httpx.AsyncHTTPTransport:
+    # httpx only retries failed connects; status retries are in post_with_retries
+    return httpx.AsyncHTTPTransport(retries=RETRY_TOTAL, limits=limits)
+
+async def post_with_retries(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    """client.post with pooled_session's status retries: rate limits and transient
+    5xx are retried with exponential backoff (honours Retry-After). Timeouts are
+    not retried, and the last response is returned rather than raised."""
+    for attempt in range(RETRY_TOTAL + 1):
+        r = await client.post(url, **kwargs)
+        if r.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+            return r
+        try:
+            delay = float(r.headers.get("Retry-After", ""))
+        except ValueError:
+            delay = RETRY_BACKOFF * 2 ** attempt
+        await r.aclose()
+        await asyncio.sleep(delay)
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 STUDENT_TONE = "Explain like I'm a college student. Be friendly, concrete, and action-focused."
 PRO_TONE = "Explain like I'm a busy young professional. Be concise, data-driven, and specific."
 
@@ -17,6 +19,7 @@ def make_budget_prompt(summary, persona: str):
     Keep it to numbered bullets.
     """
 
+@lru_cache(maxsize=64)
 def make_qa_prompt(question: str, persona: str):
     tone = STUDENT_TONE if (persona or '').lower().startswith('stu') else PRO_TONE
     return f"""You are BudgetBee. {tone}
@@ -0,0 +1,60 @@
+import re
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+SIMILARITY_THRESHOLD = 0.92
+MAX_ENTRIES = 2000
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    # Embeddings barely move with figures, so amounts/dates must match exactly
+    return tuple(_NUMBER_RE.findall(text))
+
+class SemanticCache:
+    """Reuses an earlier answer when a new question means the same thing and
+    mentions exactly the same numbers. `embed` must return one L2-normalized
+    vector per input text."""
+
+    def __init__(self, embed: Callable[[List[str]], np.ndarray],
+                 threshold: float = SIMILARITY_THRESHOLD, max_entries: int = MAX_ENTRIES):
+        self._embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._embs: Optional[np.ndarray] = None   # (n, dim) float16
+        self._entries: List[Tuple[str, str, Tuple[str, ...]]] = []  # parallel (question, answer, numbers)
+        self._lock = threading.Lock()
+
+    def _vec(self, text: str) -> np.ndarray:
+        return np.asarray(self._embed([text])[0], dtype=np.float32)
+
+    def lookup(self, question: str) -> Optional[str]:
+        if not self._entries:
+            return None
+        v = self._vec(question)
+        nums = _numbers(question)
+        with self._lock:
+            if self._embs is None:
+                return None
+            sims = self._embs @ v.astype(np.float16)
+            hits = np.flatnonzero(sims >= self.threshold)
+            for i in hits[np.argsort(-sims[hits])]:  # best match first
+                if self._entries[i][2] == nums:
+                    return self._entries[i][1]
+        return None
+
+    def add(self, question: str, answer: str) -> None:
+        v = self._vec(question).astype(np.float16)[None, :]
+        with self._lock:
+            if self._embs is None:
+                self._embs = v
+            else:
+                self._embs = np.vstack([self._embs, v])
+            self._entries.append((question, answer, _numbers(question)))
+            # Drop oldest once over capacity
+            if len(self._entries) > self.max_entries:
+                extra = len(self._entries) - self.max_entries
+                self._embs = self._embs[extra:]
+                self._entries = self._entries[extra:]